@@ -0,0 +1,56 @@
+"""active download job unique per video
+
+Revision ID: 3b1f2c9d7a10
+Revises: 91666ed9f5b0
+Create Date: 2026-10-19 10:05:12.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b1f2c9d7a10'
+down_revision: Union[str, Sequence[str], None] = '91666ed9f5b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ACTIVE_WHERE = sa.text("status IN ('queued', 'running')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 既有重複的 queued/running job：只留最新一筆，其餘標成 failed，否則建 index 會失敗
+    op.execute(
+        """
+        UPDATE download_jobs
+        SET status = 'failed',
+            error_message = 'superseded by a newer active job',
+            finished_at = CURRENT_TIMESTAMP,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE status IN ('queued', 'running')
+          AND EXISTS (
+            SELECT 1 FROM download_jobs newer
+            WHERE newer.video_id = download_jobs.video_id
+              AND newer.status IN ('queued', 'running')
+              AND (newer.created_at > download_jobs.created_at
+                   OR (newer.created_at = download_jobs.created_at AND newer.job_id > download_jobs.job_id))
+          )
+        """
+    )
+    op.create_index(
+        'uq_download_jobs_active_video',
+        'download_jobs',
+        ['video_id'],
+        unique=True,
+        postgresql_where=ACTIVE_WHERE,
+        sqlite_where=ACTIVE_WHERE,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_download_jobs_active_video', table_name='download_jobs')
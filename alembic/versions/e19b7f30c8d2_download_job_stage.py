@@ -0,0 +1,31 @@
+"""download job stage
+
+Revision ID: e19b7f30c8d2
+Revises: c52d9e4a6f17
+Create Date: 2026-10-19 11:41:55.872046
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e19b7f30c8d2'
+down_revision: Union[str, Sequence[str], None] = 'c52d9e4a6f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'download_jobs',
+        sa.Column('stage', sa.String(length=16), nullable=False, server_default='download'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('download_jobs', 'stage')
@@ -1,24 +1,89 @@
 import os
+import mimetypes
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, RedirectResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import and_, or_, select
 from datetime import datetime
 from uuid import uuid4
 
 from apps.api.app.db.session import get_db
 from apps.api.app.db.models.video import Video
-from apps.api.app.db.models.download_job import DownloadJob
-from apps.api.app.workers.queue import queue
-from apps.api.app.workers.tasks import download_task
-from rq.job import Job
-from rq.exceptions import NoSuchJobError
+from apps.api.app.db.models.download_job import ACTIVE_STATUSES, DownloadJob
+from apps.api.app.db.models.download_error import DownloadError
+from apps.api.app.db.models.download_job_archive import DownloadJobArchive
+from apps.api.app.integrations.ytdlp_client import DEFAULT_QUALITY_PROFILE, QUALITY_PROFILES
+from apps.api.app.repos import download_repo, video_repo
+from apps.api.app.services.download_service import enqueue_download, enqueue_downloads
+from apps.api.app.workers import nodes
 router = APIRouter()
 
 
 class CreateDownloadReq(BaseModel):
     video_id: str
+    quality_profile: str | None = None
+
+
+def _resolve_profile(name: str | None) -> str:
+    profile = (name or DEFAULT_QUALITY_PROFILE).strip()
+    if profile not in QUALITY_PROFILES:
+        raise HTTPException(400, f"unknown quality_profile: {profile}")
+    return profile
+
+
+def _job_out(job: DownloadJob) -> dict:
+    return {
+        "job_id": job.job_id,
+        "video_id": job.video_id,
+        "status": job.status,
+        "stage": job.stage,
+        "node_id": job.node_id,
+        "progress": job.progress,
+        "quality_profile": job.quality_profile or DEFAULT_QUALITY_PROFILE,
+        "format_id": job.format_id,
+        "vcodec": job.vcodec,
+        "acodec": job.acodec,
+        "filesize_approx": job.filesize_approx,
+        "output_path": job.output_path,
+        "error_message": job.error_message,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+def _active_conflict(job: DownloadJob, profile: str) -> HTTPException:
+    # 同一 video 同時只跑一個 job：別的 profile 正在跑時不能默默回傳那一筆，讓呼叫端知道要晚點再試
+    return HTTPException(
+        409,
+        {
+            "message": "video already has an active job with a different quality profile",
+            "job_id": job.job_id,
+            "status": job.status,
+            "quality_profile": job.quality_profile or DEFAULT_QUALITY_PROFILE,
+            "requested_quality_profile": profile,
+        },
+    )
+
+
+def _file_present(node_id: str | None, output_path: str, live: dict[str, dict]) -> bool:
+    if os.path.exists(output_path):
+        return True
+    # 別台 node 的檔案這裡看不到：只有那台還活著、能 redirect 過去時才信任 DB 的 success 紀錄，
+    # 否則當作沒有，重新建立 job
+    return not nodes.is_local(node_id) and bool(live.get(node_id, {}).get("api_url"))
+
+
+@router.get("/nodes")
+def list_nodes():
+    return {"self": nodes.NODE_ID, "nodes": list(nodes.live_nodes().values())}
+
+
+@router.get("/profiles")
+def list_profiles():
+    return {"default": DEFAULT_QUALITY_PROFILE, "profiles": QUALITY_PROFILES}
 
 
 @router.post("")
@@ -27,58 +92,183 @@ def create_download(payload: CreateDownloadReq, db: Session = Depends(get_db)):
     if not video_id:
         raise HTTPException(400, "video_id is required")
 
+    profile = _resolve_profile(payload.quality_profile)
+
     v = db.get(Video, video_id)
     if not v:
         raise HTTPException(404, "video not found")
 
     # ✅ 去重策略：
-    # 1) 若已有 running/queued job → 直接回傳同一個 job
-    stmt = (
-        select(DownloadJob)
-        .where(DownloadJob.video_id == video_id)
-        .where(DownloadJob.status.in_(["queued", "running"]))
-        .order_by(DownloadJob.created_at.desc())
-    )
-    existing = db.execute(stmt).scalars().first()
+    # 1) 若已有 running/queued job → 同 profile 直接回傳同一個 job；不同 profile → 409
+    #    （同一 video 同時只跑一個；孤兒 job 的檢查改由背景 sweep_orphan_jobs 處理，不在 request path 打 Redis）
+    existing = download_repo.active_job(db, video_id)
     if existing:
-        # ✅ 若 DB 有 queued/running 但 Redis 沒有這個 RQ job → 視為孤兒 job，補 enqueue
-        try:
-            Job.fetch(existing.job_id, connection=queue.connection)
-        except Exception:
-            existing.status = "queued"
-            existing.progress = 0
-            existing.updated_at = datetime.utcnow()
-            db.commit()
-            queue.enqueue(download_task, existing.job_id, video_id, job_id=existing.job_id)
-
-        return {"job_id": existing.job_id, "status": existing.status}
-
-    # 2) 若已有 success 且檔案存在 → 直接回傳（不再 enqueue）
+        if (existing.quality_profile or DEFAULT_QUALITY_PROFILE) != profile:
+            raise _active_conflict(existing, profile)
+        return {
+            "job_id": existing.job_id,
+            "status": existing.status,
+            "quality_profile": existing.quality_profile or DEFAULT_QUALITY_PROFILE,
+        }
+
+    # 2) 若已有同 profile 的 success 且檔案存在 → 直接回傳（不再 enqueue）
     stmt = (
         select(DownloadJob)
         .where(DownloadJob.video_id == video_id)
         .where(DownloadJob.status == "success")
+        .where(download_repo.profile_matches(profile))
         .order_by(DownloadJob.created_at.desc())
     )
     done = db.execute(stmt).scalars().first()
-    if done and done.output_path and os.path.exists(done.output_path):
-        return {"job_id": done.job_id, "status": done.status, "output_path": done.output_path}
-
-    # 否則：建立新 job
-    job_id = str(uuid4())
-    job = DownloadJob(
-        job_id=job_id,
-        video_id=video_id,
-        status="queued",
-        progress=0,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow(),
+    if done and done.output_path and _file_present(done.node_id, done.output_path, nodes.live_nodes_or_empty()):
+        return {
+            "job_id": done.job_id,
+            "status": done.status,
+            "quality_profile": profile,
+            "output_path": done.output_path,
+        }
+
+    # 否則：建立新 job（insert-or-return：併發的請求只會有一個真的寫進去並 enqueue）
+    now = datetime.utcnow()
+    job, created = download_repo.insert_job_or_get_active(
+        db,
+        {
+            "job_id": str(uuid4()),
+            "video_id": video_id,
+            "status": "queued",
+            "progress": 0,
+            "quality_profile": profile,
+            "node_id": nodes.pick_node(),
+            "created_at": now,
+            "updated_at": now,
+        },
+    )
+    if created:
+        enqueue_download(job.job_id, video_id, job.node_id)
+    elif (job.quality_profile or DEFAULT_QUALITY_PROFILE) != profile:
+        raise _active_conflict(job, profile)
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "quality_profile": job.quality_profile or DEFAULT_QUALITY_PROFILE,
+    }
+
+def _existing_out(job_id: str, video_id: str, status: str, job_profile: str | None, profile: str) -> dict:
+    # profile_mismatch：該 video 正在跑別的 profile，這次要求的 profile 沒有建立，等它結束再送一次
+    job_profile = job_profile or DEFAULT_QUALITY_PROFILE
+    return {
+        "job_id": job_id,
+        "video_id": video_id,
+        "status": status,
+        "quality_profile": job_profile,
+        "profile_mismatch": job_profile != profile,
+    }
+
+
+class BatchDownloadReq(BaseModel):
+    # 二選一：直接給 video_ids，或用跟 list_videos 一樣的篩選條件
+    video_ids: list[str] | None = None
+    q: str | None = None
+    is_short: int | None = None
+    min_views: int | None = None
+    max_duration: int | None = None
+    quality_profile: str | None = None
+
+
+@router.post("/batch")
+def create_downloads_batch(payload: BatchDownloadReq, db: Session = Depends(get_db)):
+    profile = _resolve_profile(payload.quality_profile)
+    filters = payload.model_dump(exclude={"video_ids", "quality_profile"}, exclude_none=True)
+    # q="" 在 apply_filters 裡等於沒篩選，不能讓它通過下面的檢查而排進整個資料庫
+    if isinstance(filters.get("q"), str):
+        filters["q"] = filters["q"].strip()
+    filters = {k: v for k, v in filters.items() if v != ""}
+    if payload.video_ids is None and not filters:
+        raise HTTPException(400, "video_ids or at least one filter is required")
+
+    stmt = select(Video.video_id)
+    not_found = []
+    if payload.video_ids is not None:
+        ids = list(dict.fromkeys(x.strip() for x in payload.video_ids if x and x.strip()))
+        if not ids:
+            return {"queued": [], "existing": [], "not_found": []}
+        # not_found 只看 id 存不存在；存在但被篩選條件排除的不算
+        known = set(db.execute(select(Video.video_id).where(Video.video_id.in_(ids))).scalars())
+        not_found = [x for x in ids if x not in known]
+        stmt = stmt.where(Video.video_id.in_(ids))
+    stmt = video_repo.apply_filters(stmt, **filters)
+    video_ids = db.execute(stmt).scalars().all()
+
+    # 一次查完整批的去重資訊：active job 或（同 profile、檔案還在的）success job 都不用再下載
+    stmt = (
+        select(
+            DownloadJob.video_id,
+            DownloadJob.job_id,
+            DownloadJob.status,
+            DownloadJob.quality_profile,
+            DownloadJob.node_id,
+            DownloadJob.output_path,
+        )
+        .where(DownloadJob.video_id.in_(video_ids))
+        .where(
+            or_(
+                DownloadJob.status.in_(ACTIVE_STATUSES),
+                and_(DownloadJob.status == "success", download_repo.profile_matches(profile)),
+            )
+        )
+        .order_by(DownloadJob.created_at.desc())
     )
-    db.add(job)
+    existing: dict[str, dict] = {}
+    live = nodes.live_nodes_or_empty()
+    for vid, job_id, status, job_profile, node_id, output_path in db.execute(stmt):
+        if status in ACTIVE_STATUSES:
+            existing[vid] = _existing_out(job_id, vid, status, job_profile, profile)
+        elif vid not in existing and output_path and _file_present(node_id, output_path, live):
+            existing[vid] = _existing_out(job_id, vid, status, job_profile, profile)
+
+    # 其餘的一個 transaction 全部 insert（依各 node 剩餘空間 / load 分配）
+    now = datetime.utcnow()
+    todo = [vid for vid in video_ids if vid not in existing]
+    rows = [
+        {
+            "job_id": str(uuid4()),
+            "video_id": vid,
+            "status": "queued",
+            "progress": 0,
+            "quality_profile": profile,
+            "node_id": node_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for vid, node_id in zip(todo, nodes.assign_nodes(len(todo)))
+    ]
+    inserted = download_repo.insert_jobs(db, rows)
     db.commit()
 
-    queue.enqueue(download_task, job_id, video_id, job_id=job_id)
-    return {"job_id": job_id, "status": "queued"}
+    queued = [(r["job_id"], r["video_id"], r["node_id"]) for r in rows if r["job_id"] in inserted]
+    enqueue_downloads(queued)
+
+    # insert 被擋下的 = 查詢之後才被別人建立的 active job
+    raced = [r["video_id"] for r in rows if r["job_id"] not in inserted]
+    if raced:
+        stmt = (
+            select(DownloadJob.video_id, DownloadJob.job_id, DownloadJob.status, DownloadJob.quality_profile)
+            .where(DownloadJob.video_id.in_(raced))
+            .where(DownloadJob.status.in_(ACTIVE_STATUSES))
+        )
+        for vid, job_id, status, job_profile in db.execute(stmt):
+            existing[vid] = _existing_out(job_id, vid, status, job_profile, profile)
+
+    return {
+        "quality_profile": profile,
+        "queued": [
+            {"job_id": job_id, "video_id": vid, "status": "queued", "node_id": node_id}
+            for job_id, vid, node_id in queued
+        ],
+        "existing": list(existing.values()),
+        "not_found": not_found,
+    }
+
 
 @router.get("/by_video/{video_id}")
 def latest_job_by_video(video_id: str, db: Session = Depends(get_db)):
@@ -91,53 +281,60 @@ def latest_job_by_video(video_id: str, db: Session = Depends(get_db)):
     job = db.execute(stmt).scalars().first()
     if not job:
         raise HTTPException(404, "job not found")
-    return {
-        "job_id": job.job_id,
-        "video_id": job.video_id,
-        "status": job.status,
-        "progress": job.progress,
-        "output_path": job.output_path,
-        "error_message": job.error_message,
-        "started_at": job.started_at,
-        "finished_at": job.finished_at,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at,
-    }
+    return _job_out(job)
 
 
 @router.get("/{job_id}")
 def get_download(job_id: str, db: Session = Depends(get_db)):
     job = db.get(DownloadJob, job_id)
     if not job:
-        raise HTTPException(404, "job not found")
-    return {
-        "job_id": job.job_id,
-        "video_id": job.video_id,
-        "status": job.status,
-        "progress": job.progress,
-        "output_path": job.output_path,
-        "error_message": job.error_message,
-        "started_at": job.started_at,
-        "finished_at": job.finished_at,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at,
-    }
+        # 可能已被 retention 搬到 archive
+        archived = db.get(DownloadJobArchive, job_id)
+        if not archived:
+            raise HTTPException(404, "job not found")
+        error = db.get(DownloadError, archived.error_id) if archived.error_id else None
+        return {
+            "job_id": archived.job_id,
+            "video_id": archived.video_id,
+            "status": archived.status,
+            "archived": True,
+            "quality_profile": archived.quality_profile or DEFAULT_QUALITY_PROFILE,
+            "format_id": archived.format_id,
+            "filesize_approx": archived.filesize_approx,
+            "node_id": archived.node_id,
+            "output_path": archived.output_path,
+            "error_message": error.message if error else None,
+            "started_at": archived.started_at,
+            "finished_at": archived.finished_at,
+            "created_at": archived.created_at,
+            "archived_at": archived.archived_at,
+        }
+    return _job_out(job)
 from sqlalchemy import select
 
 
 # (3) 下載檔案 endpoint
 @router.get("/{job_id}/file")
 def download_file(job_id: str, db: Session = Depends(get_db)):
-    job = db.get(DownloadJob, job_id)
+    # 被 retention 搬到 archive 的 job 檔案仍在原處，照樣提供（跟 get_download 一致）
+    job = db.get(DownloadJob, job_id) or db.get(DownloadJobArchive, job_id)
     if not job:
         raise HTTPException(404, "job not found")
     if job.status != "success" or not job.output_path:
         raise HTTPException(409, "file is not ready")
+
     if not os.path.exists(job.output_path):
+        # 檔案在別台 node → redirect 到那台的 API
+        if not nodes.is_local(job.node_id):
+            owner = nodes.live_nodes_or_empty().get(job.node_id)
+            if not owner or not owner["api_url"]:
+                raise HTTPException(503, f"storage node {job.node_id} is unavailable")
+            return RedirectResponse(f"{owner['api_url'].rstrip('/')}/downloads/{job_id}/file", status_code=307)
         raise HTTPException(410, "file missing on disk")
 
     filename = os.path.basename(job.output_path)
-    return FileResponse(path=job.output_path, filename=filename, media_type="video/mp4")
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return FileResponse(path=job.output_path, filename=filename, media_type=media_type)
 
 
 
@@ -167,18 +364,4 @@ def latest_jobs_by_videos(payload: ByVideosReq, db: Session = Depends(get_db)):
         if j.video_id not in latest:
             latest[j.video_id] = j
 
-    return [
-        {
-            "job_id": j.job_id,
-            "video_id": j.video_id,
-            "status": j.status,
-            "progress": j.progress,
-            "output_path": j.output_path,
-            "error_message": j.error_message,
-            "started_at": j.started_at,
-            "finished_at": j.finished_at,
-            "created_at": j.created_at,
-            "updated_at": j.updated_at,
-        }
-        for j in latest.values()
-    ]
\ No newline at end of file
+    return [_job_out(j) for j in latest.values()]
@@ -1,4 +1,7 @@
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy import select
@@ -6,6 +9,8 @@ from sqlalchemy import select
 from apps.api.app.db.session import get_db
 from apps.api.app.db.models.video import Video
 from apps.api.app.integrations.ytdlp_client import extract_info
+from apps.api.app.repos import video_repo
+from apps.api.app.services import video_list_cache
 
 router = APIRouter()
 
@@ -40,7 +45,9 @@ def add_by_url(payload: AddByUrlReq, db: Session = Depends(get_db)):
             view_count=info.get("view_count"),
             upload_date=info.get("upload_date"),
             uploader=info.get("uploader"),
+            channel_url=info.get("channel_url"),
             is_short=is_short,
+            metadata_refreshed_at=datetime.utcnow(),
         )
         db.add(v)
     else:
@@ -51,9 +58,12 @@ def add_by_url(payload: AddByUrlReq, db: Session = Depends(get_db)):
         v.view_count = info.get("view_count") if info.get("view_count") is not None else v.view_count
         v.upload_date = info.get("upload_date") or v.upload_date
         v.uploader = info.get("uploader") or v.uploader
+        v.channel_url = info.get("channel_url") or v.channel_url
         v.is_short = is_short
+        v.metadata_refreshed_at = datetime.utcnow()
 
     db.commit()
+    video_list_cache.invalidate()
     return {"ok": True, "video_id": vid}
 
 @router.get("")
@@ -62,21 +72,31 @@ def list_videos(
     is_short: int | None = Query(default=None),
     min_views: int | None = Query(default=None),
     max_duration: int | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    cursor: int | None = Query(default=None, ge=0),  # 下一頁的 offset
     db: Session = Depends(get_db),
 ):
-    stmt = select(Video).order_by(Video.created_at.desc())
+    filters = {
+        "q": q,
+        "is_short": is_short,
+        "min_views": min_views,
+        "max_duration": max_duration,
+        "limit": limit,
+        "cursor": cursor,
+    }
+    cache_key, cached = video_list_cache.get_cached(filters)
+    if cached is not None:
+        return cached
 
-    if q:
-        stmt = stmt.where(Video.title.contains(q))
-    if is_short is not None:
-        stmt = stmt.where(Video.is_short == is_short)
-    if min_views is not None:
-        stmt = stmt.where(Video.view_count.is_not(None)).where(Video.view_count >= min_views)
-    if max_duration is not None:
-        stmt = stmt.where(Video.duration.is_not(None)).where(Video.duration <= max_duration)
+    stmt = select(Video).order_by(Video.created_at.desc(), Video.video_id.asc())
+    stmt = video_repo.apply_filters(stmt, q, is_short, min_views, max_duration)
+    if cursor:
+        stmt = stmt.offset(cursor)
+    if limit is not None:
+        stmt = stmt.limit(limit)
 
     rows = db.execute(stmt).scalars().all()
-    return [
+    result = jsonable_encoder([
         {
             "video_id": v.video_id,
             "webpage_url": v.webpage_url,
@@ -89,4 +109,11 @@ def list_videos(
             "created_at": v.created_at,
         }
         for v in rows
-    ]
\ No newline at end of file
+    ])
+    video_list_cache.set_cached(cache_key, result)
+    return result
+
+
+@router.get("/cache_stats")
+def cache_stats():
+    return video_list_cache.stats()
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from apps.api.app.db.base import Base
+
+
+class DownloadError(Base):
+    __tablename__ = "download_errors"
+
+    # sha1(message)：同樣的錯誤訊息只存一份，archive 只記 error_id
+    error_id: Mapped[str] = mapped_column(String(40), primary_key=True)
+    message: Mapped[str] = mapped_column(Text)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
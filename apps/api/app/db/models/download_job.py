@@ -1,20 +1,45 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer, String, Text, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from apps.api.app.db.base import Base
 
+# 仍在進行中的狀態：同一個 video 同時只能有一筆（由 partial unique index 保證）
+ACTIVE_STATUSES = ("queued", "running")
+ACTIVE_WHERE = text("status IN ('queued', 'running')")
+
 
 class DownloadJob(Base):
     __tablename__ = "download_jobs"
+    __table_args__ = (
+        Index(
+            "uq_download_jobs_active_video",
+            "video_id",
+            unique=True,
+            postgresql_where=ACTIVE_WHERE,
+            sqlite_where=ACTIVE_WHERE,
+        ),
+        # 「某 video 最新的 job」類查詢（by_video / by_videos / retention）
+        Index("ix_download_jobs_video_created", "video_id", "created_at"),
+    )
 
     job_id: Mapped[str] = mapped_column(String, primary_key=True)
     video_id: Mapped[str] = mapped_column(ForeignKey("videos.video_id"), index=True)
 
     status: Mapped[str] = mapped_column(String(32), default="queued")  # queued/running/success/failed
+    stage: Mapped[str] = mapped_column(String(16), default="download")  # download/postprocess（status 是該 stage 的狀態）
     progress: Mapped[int] = mapped_column(Integer, default=0)          # 0~100（先簡單）
 
+    # 品質設定與實際選到的格式（None = 舊資料 / 預設 profile）
+    quality_profile: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    format_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    vcodec: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    acodec: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    filesize_approx: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+    # 檔案存放的 node（多台下載機時，post-processing 與檔案下載都要回到這台）
+    node_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
     output_path: Mapped[str | None] = mapped_column(Text, nullable=True)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
 
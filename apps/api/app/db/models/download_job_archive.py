@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from apps.api.app.db.base import Base
+
+
+class DownloadJobArchive(Base):
+    """retention 搬走的舊 download job（精簡欄位，錯誤訊息改存 download_errors 的 id）。"""
+
+    __tablename__ = "download_jobs_archive"
+
+    job_id: Mapped[str] = mapped_column(String, primary_key=True)
+    video_id: Mapped[str] = mapped_column(String, index=True)
+
+    status: Mapped[str] = mapped_column(String(32))
+    quality_profile: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    format_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    filesize_approx: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    node_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    output_path: Mapped[str | None] = mapped_column(Text, nullable=True)
+    error_id: Mapped[str | None] = mapped_column(ForeignKey("download_errors.error_id"), nullable=True)
+
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
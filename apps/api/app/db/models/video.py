@@ -21,6 +21,10 @@ class Video(Base):
     duration: Mapped[int | None] = mapped_column(Integer, nullable=True)
     view_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
+    # 背景 refresher 用：channel_url 讓同頻道的影片能一次 flat 抓回來
+    channel_url: Mapped[str | None] = mapped_column(Text, nullable=True)
+    metadata_refreshed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
+
     is_short: Mapped[int] = mapped_column(Integer, default=0)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -1,14 +1,26 @@
+import os
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from apps.api.app.core.config import DATABASE_URL
 
-engine = create_engine(DATABASE_URL, future=True)
+# pre_ping / recycle：長駐的 worker 連線可能被 DB 端斷掉
+engine = create_engine(DATABASE_URL, future=True, pool_pre_ping=True, pool_recycle=1800)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+
+def _dispose_in_child():
+    # RQ fork 出來的 work-horse 不能沿用父 process 的連線（socket 共用會互相踩），
+    # close=False：只丟掉 pool，不去關父 process 還在用的連線
+    engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_in_child)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,48 @@
+import os
+import subprocess
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+
+# 這些 container 加 faststart（moov 移到檔頭，邊下載邊播）
+FASTSTART_EXTS = (".mp4", ".m4a", ".mov")
+
+
+def _run(args: list[str]) -> None:
+    proc = subprocess.run([FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y", *args], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {proc.stderr.strip()[-500:]}")
+
+
+def remux(parts: list[str], output_path: str) -> str:
+    """把 download stage 抓下來的 stream 合併 / remux 成 output_path（只 stream copy，不重新編碼）。
+
+    成功後刪掉原本的 stream 檔。
+    """
+    faststart = output_path.lower().endswith(FASTSTART_EXTS)
+    if len(parts) == 1 and not faststart:
+        # 單一 stream 又不需要 faststart → 直接改名就好
+        os.replace(parts[0], output_path)
+        return output_path
+
+    args = []
+    for p in parts:
+        args += ["-i", p]
+    for i in range(len(parts)):
+        args += ["-map", str(i)]
+    args += ["-c", "copy"]
+    if faststart:
+        args += ["-movflags", "+faststart"]
+
+    # 先寫到暫存檔再 rename，避免半成品被當成已完成的檔案
+    tmp = f"{output_path}.tmp{os.path.splitext(output_path)[1]}"
+    _run([*args, tmp])
+    os.replace(tmp, output_path)
+    for p in parts:
+        os.remove(p)
+    return output_path
+
+
+def thumbnail(video_path: str, at_seconds: int = 1) -> str:
+    out = os.path.splitext(video_path)[0] + ".jpg"
+    _run(["-ss", str(at_seconds), "-i", video_path, "-frames:v", "1", out])
+    return out
@@ -1,23 +1,107 @@
 import os
 import re
-import glob
+import json
+from contextlib import contextmanager
+
 import yt_dlp
 
+# persistent worker 模式下重用 YoutubeDL（extractor、HTTP 連線池、cookie 都留著），
+# fork-per-job 的 worker 每個 job 都是新 process，開了也沒差
+YTDLP_REUSE = os.getenv("YTDLP_REUSE", "0") == "1"
+
+_ydl_cache: dict[str, yt_dlp.YoutubeDL] = {}
+
+
+@contextmanager
+def _ydl(opts: dict):
+    if not YTDLP_REUSE:
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            yield ydl
+        return
+
+    key = json.dumps(opts, sort_keys=True)
+    ydl = _ydl_cache.get(key)
+    if ydl is None:
+        ydl = _ydl_cache[key] = yt_dlp.YoutubeDL(opts)
+    yield ydl
+
+
+def warm_up(profile_names: list[str] | None = None) -> None:
+    """預先建好各 profile 的 YoutubeDL（會載入 extractor），讓第一個 job 不用付這個成本。"""
+    for name in profile_names or list(QUALITY_PROFILES):
+        with _ydl(_stream_opts(QUALITY_PROFILES[name])):
+            pass
+
+
+def close_cached() -> None:
+    while _ydl_cache:
+        _, ydl = _ydl_cache.popitem()
+        ydl.close()
+
+
+class VideoUnavailable(RuntimeError):
+    """影片確定拿不到（下架、私人、會員限定、帳號被停權…），重試也不會好。"""
+
+
+# YouTube extractor 對「影片本身不存在 / 看不到」的錯誤訊息；網路錯誤、429、bot 檢查都不在這裡
+_UNAVAILABLE_MARKERS = (
+    "video unavailable",
+    "private video",
+    "has been removed",
+    "no longer available",
+    "account associated with this video has been terminated",
+    "members-only",
+    "not made this video available in your country",
+)
+
 
 def extract_info(url: str) -> dict:
+    # ignoreerrors=False：錯誤要丟出來，呼叫端才分得出「影片沒了」跟「暫時失敗」
     opts = {
         "quiet": True,
         "skip_download": True,
-        "ignoreerrors": True,
+        "ignoreerrors": False,
         "retries": 3,
     }
-    with yt_dlp.YoutubeDL(opts) as ydl:
-        info = ydl.extract_info(url, download=False)
+    try:
+        with _ydl(opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+    except yt_dlp.utils.DownloadError as e:
+        message = str(e).lower()
+        if any(marker in message for marker in _UNAVAILABLE_MARKERS):
+            raise VideoUnavailable(str(e)) from e
+        raise
     if not info:
         raise RuntimeError("yt-dlp returned empty info")
     return info
 
 
+def extract_flat(url: str, max_entries: int = 500) -> list[dict]:
+    """列出 playlist / channel tab 的 entries（不逐支解析），一次 request 拿到多支影片的 view_count 等欄位。"""
+    opts = {
+        "quiet": True,
+        "skip_download": True,
+        "ignoreerrors": True,
+        "retries": 3,
+        "extract_flat": "in_playlist",
+        "playlistend": max_entries,
+    }
+    with _ydl(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if not info:
+        return []
+
+    entries = []
+    stack = [info]
+    while stack:
+        node = stack.pop()
+        if node.get("entries") is not None:
+            stack.extend(e for e in node["entries"] if e)
+        elif node.get("id"):
+            entries.append(node)
+    return entries
+
+
 def _safe_dir(name: str | None) -> str:
     s = (name or "unknown").strip()
     s = re.sub(r"[^\w\-\.\s]", "_", s)  # 移除不安全字元
@@ -25,28 +109,115 @@ def _safe_dir(name: str | None) -> str:
     return s[:80] if s else "unknown"
 
 
-def download_video(url: str, base_outdir: str, video_id: str, uploader: str | None, max_height: int = 1080) -> str:
-    uploader_dir = _safe_dir(uploader)
-    outdir = os.path.join(base_outdir, uploader_dir)
-    os.makedirs(outdir, exist_ok=True)
+# 下載品質設定：
+# - container 決定 merge 的目標格式；選格式時優先挑能直接 stream copy 進該 container 的 codec
+#   （mp4 → avc1 + mp4a，mkv 什麼都能裝），避免 ffmpeg remux 失敗或重新編碼
+# - max_filesize 用 filesize_approx 過濾（沒有大小資訊的格式不擋）
+QUALITY_PROFILES: dict[str, dict] = {
+    "archive": {"max_height": None, "container": "mkv", "max_filesize": None, "audio_only": False},
+    "mp4_1080": {"max_height": 1080, "container": "mp4", "max_filesize": None, "audio_only": False},
+    "mobile_480p": {"max_height": 480, "container": "mp4", "max_filesize": "300M", "audio_only": False},
+    "audio_only": {"max_height": None, "container": "m4a", "max_filesize": None, "audio_only": True},
+}
+DEFAULT_QUALITY_PROFILE = os.getenv("DEFAULT_QUALITY_PROFILE", "mp4_1080")
+# 設錯的話 API / worker 直接起不來，而不是等到第一個 job 才失敗
+if DEFAULT_QUALITY_PROFILE not in QUALITY_PROFILES:
+    raise RuntimeError(
+        f"DEFAULT_QUALITY_PROFILE={DEFAULT_QUALITY_PROFILE!r} is not a known profile, "
+        f"expected one of: {', '.join(QUALITY_PROFILES)}"
+    )
+
+
+def _filters(*parts: str | None) -> str:
+    return "".join(f"[{p}]" for p in parts if p)
+
+
+def format_selector(profile: dict) -> str:
+    height = f"height<={profile['max_height']}" if profile.get("max_height") else None
+    size = f"filesize_approx<?{profile['max_filesize']}" if profile.get("max_filesize") else None
+    container = profile["container"]
+
+    if profile.get("audio_only"):
+        preferred = "acodec^=mp4a" if container == "m4a" else None
+        choices = [f"ba{_filters(preferred, size)}", f"ba{_filters(size)}", "ba"]
+        return "/".join(dict.fromkeys(choices))
+
+    if container == "mp4":
+        choices = [
+            f"bv*{_filters(height, 'vcodec^=avc1', size)}+ba{_filters('acodec^=mp4a')}",
+            f"b{_filters(height, 'ext=mp4', size)}",
+            f"bv*{_filters(height, size)}+ba",
+            f"b{_filters(height)}",
+        ]
+    else:
+        choices = [
+            f"bv*{_filters(height, size)}+ba",
+            f"b{_filters(height, size)}",
+        ]
+    return "/".join(dict.fromkeys(choices + ["b"]))
+
+
+def _chosen_format(info: dict) -> dict:
+    parts = info.get("requested_formats") or [info]
+    vcodec = next((f.get("vcodec") for f in parts if f.get("vcodec") not in (None, "none")), None)
+    acodec = next((f.get("acodec") for f in parts if f.get("acodec") not in (None, "none")), None)
+    sizes = [f.get("filesize") or f.get("filesize_approx") for f in parts]
+    return {
+        "format_id": info.get("format_id"),
+        "vcodec": vcodec,
+        "acodec": acodec,
+        "filesize_approx": int(sum(sizes)) if all(sizes) else None,
+    }
 
-    outtmpl = os.path.join(outdir, f"{video_id}.%(ext)s")
 
-    ydl_opts = {
-        "outtmpl": outtmpl,
-        "format": f"bestvideo[height<={max_height}]+bestaudio/best",
-        "merge_output_format": "mp4",
+def _stream_opts(profile: dict) -> dict:
+    return {
+        "format": format_selector(profile),
         "quiet": True,
         "retries": 3,
     }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
 
-    # 保守找實際輸出（避免極端狀況不是 mp4）
-    candidates = glob.glob(os.path.join(outdir, f"{video_id}.*"))
-    if not candidates:
-        raise RuntimeError("download finished but output file not found")
 
-    # 優先 mp4
-    mp4 = [p for p in candidates if p.lower().endswith(".mp4")]
-    return mp4[0] if mp4 else candidates[0]
\ No newline at end of file
+def download_streams(
+    url: str,
+    base_outdir: str,
+    video_id: str,
+    uploader: str | None,
+    profile_name: str = DEFAULT_QUALITY_PROFILE,
+) -> dict:
+    """只做網路下載：依 profile 選好格式，把每個 stream 各自存成檔案，不在這裡 merge。
+
+    回傳 {"parts", "output_path", "format_id", "vcodec", "acodec", "filesize_approx"}；
+    parts 交給 post-processing stage（ffmpeg）合併 / remux 成 output_path。
+    """
+    profile = QUALITY_PROFILES[profile_name]
+    uploader_dir = _safe_dir(uploader)
+    outdir = os.path.join(base_outdir, uploader_dir)
+    os.makedirs(outdir, exist_ok=True)
+
+    # 不同 profile 的檔案不能互相覆蓋；預設 profile 維持舊檔名
+    stem = video_id if profile_name == DEFAULT_QUALITY_PROFILE else f"{video_id}.{profile_name}"
+
+    with _ydl(_stream_opts(profile)) as ydl:
+        info = ydl.extract_info(url, download=False)
+        if not info:
+            raise RuntimeError("yt-dlp returned empty info")
+
+        formats = info.get("requested_formats") or [info]
+        parts = []
+        for f in formats:
+            part = os.path.join(outdir, f"{stem}.f{f['format_id']}.{f['ext']}")
+            # 完整下載完才會從 .part 改名，所以檔案存在 = 上次已經抓完（例如 post stage 失敗後重跑）
+            if not os.path.exists(part):
+                f_info = {k: v for k, v in info.items() if k != "requested_formats"}
+                f_info.update(f)
+                success, _ = ydl.dl(part, f_info)
+                if not success:
+                    raise RuntimeError(f"download failed for format {f['format_id']}")
+            parts.append(part)
+
+    # 多個 stream → merge 成 profile 的 container；單一 stream 保留原本的副檔名（跟 yt-dlp 一樣）
+    ext = profile["container"] if len(parts) > 1 else formats[0]["ext"]
+    output_path = os.path.join(outdir, f"{stem}.{ext}")
+
+    return {"parts": parts, "output_path": output_path, **_chosen_format(info)}
@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from apps.api.app.api.router import api_router
-from apps.api.app.db.models import video, download_job
+from apps.api.app.db.models import video, download_job, download_error, download_job_archive
 app = FastAPI(title="YT GUI API")
 app.include_router(api_router)
 
@@ -0,0 +1,62 @@
+from sqlalchemy import insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from apps.api.app.db.models.download_job import ACTIVE_STATUSES, ACTIVE_WHERE, DownloadJob
+from apps.api.app.integrations.ytdlp_client import DEFAULT_QUALITY_PROFILE
+
+
+def profile_matches(profile: str):
+    # quality_profile 為 NULL 的舊 job 視為預設 profile
+    if profile == DEFAULT_QUALITY_PROFILE:
+        return or_(DownloadJob.quality_profile == profile, DownloadJob.quality_profile.is_(None))
+    return DownloadJob.quality_profile == profile
+
+
+def active_job(db: Session, video_id: str) -> DownloadJob | None:
+    stmt = (
+        select(DownloadJob)
+        .where(DownloadJob.video_id == video_id)
+        .where(DownloadJob.status.in_(ACTIVE_STATUSES))
+    )
+    return db.execute(stmt).scalars().first()
+
+
+def insert_jobs(db: Session, rows: list[dict]) -> set[str]:
+    """INSERT ... ON CONFLICT DO NOTHING（衝突目標是 active job 的 partial unique index）。
+
+    回傳真的寫進去的 job_id；沒寫進去的代表該 video 已經有 queued/running job。
+    不 commit，交給呼叫端決定 transaction 邊界。
+    """
+    if not rows:
+        return set()
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(DownloadJob)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(DownloadJob)
+    else:
+        # 其他 DB 沒有 upsert：靠 unique index 擋，衝突時整批失敗（IntegrityError）
+        db.execute(insert(DownloadJob), rows)
+        return {r["job_id"] for r in rows}
+
+    stmt = stmt.on_conflict_do_nothing(
+        index_elements=[DownloadJob.video_id],
+        index_where=ACTIVE_WHERE,
+    ).returning(DownloadJob.job_id)
+    return set(db.execute(stmt, rows).scalars().all())
+
+
+def insert_job_or_get_active(db: Session, row: dict) -> tuple[DownloadJob, bool]:
+    """原子地建立 job；若同一 video 已有 active job 就回傳那一筆。回傳 (job, created)。"""
+    created = bool(insert_jobs(db, [row]))
+    db.commit()
+    if created:
+        return db.get(DownloadJob, row["job_id"]), True
+
+    existing = active_job(db, row["video_id"])
+    if existing is None:
+        # 衝突的那筆剛好在這瞬間結束 → 再試一次
+        return insert_job_or_get_active(db, row)
+    return existing, False
@@ -0,0 +1,22 @@
+from sqlalchemy import Select
+
+from apps.api.app.db.models.video import Video
+
+
+def apply_filters(
+    stmt: Select,
+    q: str | None = None,
+    is_short: int | None = None,
+    min_views: int | None = None,
+    max_duration: int | None = None,
+) -> Select:
+    """list_videos 與批次下載共用的篩選條件。"""
+    if q:
+        stmt = stmt.where(Video.title.contains(q))
+    if is_short is not None:
+        stmt = stmt.where(Video.is_short == is_short)
+    if min_views is not None:
+        stmt = stmt.where(Video.view_count.is_not(None)).where(Video.view_count >= min_views)
+    if max_duration is not None:
+        stmt = stmt.where(Video.duration.is_not(None)).where(Video.duration <= max_duration)
+    return stmt
@@ -0,0 +1,182 @@
+import os
+import logging
+from datetime import datetime, timedelta
+
+from rq import Queue
+from rq.job import Job, JobStatus
+from sqlalchemy import and_, or_, select
+
+from apps.api.app.db.session import SessionLocal
+from apps.api.app.db.models.download_job import ACTIVE_STATUSES, DownloadJob
+from apps.api.app.workers import nodes
+from apps.api.app.workers.queue import get_queue, queue, redis_conn
+
+log = logging.getLogger("download_service")
+
+# 剛建立的 job 可能還沒 enqueue（commit 與 enqueue 之間），給一點緩衝時間再判定孤兒
+ORPHAN_GRACE_SECONDS = int(os.getenv("ORPHAN_GRACE_SECONDS", "120"))
+ORPHAN_SWEEP_BATCH = int(os.getenv("ORPHAN_SWEEP_BATCH", "500"))
+ENQUEUE_PIPELINE_CHUNK = int(os.getenv("ENQUEUE_PIPELINE_CHUNK", "1000"))
+
+# 上次掃到哪一筆（updated_at|job_id）；健康的 queued job 不會更新 updated_at，
+# 每次都從最舊的開始掃的話，積壓超過一批時後面的孤兒永遠掃不到
+SWEEP_CURSOR_KEY = "download:sweep:cursor"
+
+DOWNLOAD_TASK = "apps.api.app.workers.tasks.download_task"
+POSTPROCESS_TASK = "apps.api.app.workers.tasks.postprocess_task"
+
+_DEAD_RQ_STATUSES = (JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED)
+
+
+def enqueue_lock(job_id: str):
+    # create_download 與 sweep 都會 enqueue 同一個 job_id，用同一把鎖避免重複進 queue
+    return redis_conn.lock(f"download:enqueue:{job_id}", timeout=30, blocking_timeout=10)
+
+
+def download_queue(node_id: str | None):
+    # 沒指定 node（單機部署）→ 共用的 downloads queue，任何 worker 都會拿
+    return get_queue(nodes.download_queue_name(node_id)) if node_id else queue
+
+
+def enqueue_download(job_id: str, video_id: str, node_id: str | None = None) -> None:
+    with enqueue_lock(job_id):
+        download_queue(node_id).enqueue(DOWNLOAD_TASK, job_id, video_id, job_id=job_id)
+
+
+def postprocess_rq_id(job_id: str) -> str:
+    # RQ 的 job id 只接受英數、底線、dash（冒號會被 parse_job_id 截掉）
+    return f"{job_id}-post"
+
+
+def rq_job_id(job: DownloadJob) -> str:
+    # 兩個 stage 各自是一個 RQ job
+    return postprocess_rq_id(job.job_id) if job.stage == "postprocess" else job.job_id
+
+
+def enqueue_postprocess(job_id: str, parts: list[str], output_path: str) -> None:
+    # stream 檔在這台 node 的本機磁碟上，所以一定進這台的 postprocess queue
+    get_queue(nodes.postprocess_queue_name(nodes.NODE_ID)).enqueue(
+        POSTPROCESS_TASK, job_id, parts, output_path, job_id=postprocess_rq_id(job_id)
+    )
+
+
+def enqueue_downloads(jobs: list[tuple[str, str, str | None]]) -> None:
+    """批次 enqueue [(job_id, video_id, node_id), ...]：enqueue_many + pipeline，每個 chunk 一次 round-trip。
+
+    這些 job 都是剛 insert 成功的，不會跟別人搶同一個 job_id，所以不用逐一上鎖；
+    萬一 enqueue 失敗，sweep_orphan_jobs 會在 grace period 後補上。
+    """
+    for i in range(0, len(jobs), ENQUEUE_PIPELINE_CHUNK):
+        by_node: dict[str | None, list[tuple[str, str]]] = {}
+        for job_id, video_id, node_id in jobs[i : i + ENQUEUE_PIPELINE_CHUNK]:
+            by_node.setdefault(node_id, []).append((job_id, video_id))
+        with redis_conn.pipeline() as pipe:
+            for node_id, chunk in by_node.items():
+                download_queue(node_id).enqueue_many(
+                    [
+                        Queue.prepare_data(DOWNLOAD_TASK, args=(job_id, video_id), job_id=job_id)
+                        for job_id, video_id in chunk
+                    ],
+                    pipeline=pipe,
+                )
+            pipe.execute()
+
+
+def _requeue(db, job: DownloadJob, live: dict[str, dict]) -> None:
+    # 原本的 node 還活著就留在那台（已經抓完的 stream 檔在那），否則重新分配；
+    # post stage 也從 download stage 重跑，已經抓完的 stream 檔會直接沿用
+    if job.node_id not in live:
+        job.node_id = nodes.pick_node()
+    job.stage = "download"
+    job.status = "queued"
+    job.progress = 0
+    job.updated_at = datetime.utcnow()
+    db.commit()
+    download_queue(job.node_id).enqueue(DOWNLOAD_TASK, job.job_id, job.video_id, job_id=job.job_id)
+
+
+def _sweep_cursor() -> tuple[datetime, str] | None:
+    raw = redis_conn.get(SWEEP_CURSOR_KEY)
+    if not raw:
+        return None
+    updated_at, job_id = raw.decode().split("|", 1)
+    return datetime.fromisoformat(updated_at), job_id
+
+
+def sweep_orphan_jobs() -> dict:
+    """背景掃描：DB 是 queued/running 但 RQ 那邊已經沒有 / 已經失敗的 job。
+
+    - RQ 找不到 → 重新 enqueue（原本在 create_download 的 request path 做）；
+      post stage 的孤兒從 download stage 重跑，已經抓完的 stream 檔會直接沿用
+    - 還排在已經下線的 node 的 queue 裡 → 從那個 queue 刪掉，改派到活著的 node
+    - RQ 已 failed/stopped/canceled（例如 worker 被 kill，task 來不及寫 DB）→ DB 標成 failed，
+      否則 active unique index 會讓這個 video 永遠無法再下載
+
+    每次掃 ORPHAN_SWEEP_BATCH 筆，用 (updated_at, job_id) 的 keyset cursor 接著上次往後掃，
+    掃到底再從頭開始。
+    """
+    db = SessionLocal()
+    requeued = failed = 0
+    try:
+        cutoff = datetime.utcnow() - timedelta(seconds=ORPHAN_GRACE_SECONDS)
+        stmt = (
+            select(DownloadJob)
+            .where(DownloadJob.status.in_(ACTIVE_STATUSES))
+            .where(DownloadJob.updated_at < cutoff)
+            .order_by(DownloadJob.updated_at.asc(), DownloadJob.job_id.asc())
+            .limit(ORPHAN_SWEEP_BATCH)
+        )
+        cursor = _sweep_cursor()
+        if cursor:
+            after_at, after_id = cursor
+            stmt = stmt.where(
+                or_(
+                    DownloadJob.updated_at > after_at,
+                    and_(DownloadJob.updated_at == after_at, DownloadJob.job_id > after_id),
+                )
+            )
+        jobs = db.execute(stmt).scalars().all()
+        if len(jobs) < ORPHAN_SWEEP_BATCH:
+            # 掃到底了，下次從最舊的開始
+            redis_conn.delete(SWEEP_CURSOR_KEY)
+        else:
+            # 在處理前記下來：requeue / 標 failed 都會改 updated_at
+            redis_conn.set(SWEEP_CURSOR_KEY, f"{jobs[-1].updated_at.isoformat()}|{jobs[-1].job_id}")
+        if not jobs:
+            return {"requeued": 0, "failed": 0}
+
+        live = nodes.live_nodes()
+        rq_jobs = Job.fetch_many([rq_job_id(j) for j in jobs], connection=redis_conn)
+        for job, rq_job in zip(jobs, rq_jobs):
+            if rq_job is None:
+                with enqueue_lock(job.job_id):
+                    # 拿到鎖後再確認一次，避免跟 create_download 撞在一起
+                    if Job.exists(rq_job_id(job), connection=redis_conn):
+                        continue
+                    _requeue(db, job, live)
+                requeued += 1
+            elif (
+                job.node_id is not None
+                and job.node_id not in live
+                and rq_job.get_status(refresh=False) == JobStatus.QUEUED
+            ):
+                # 排在已經下線的 node 的 queue 裡：沒有 worker 會來拿，
+                # 不搬走的話 active unique index 會讓這個 video 永遠卡在這筆 job
+                with enqueue_lock(job.job_id):
+                    rq_job.delete()
+                    _requeue(db, job, live)
+                requeued += 1
+            elif rq_job.get_status(refresh=False) in _DEAD_RQ_STATUSES:
+                job.status = "failed"
+                job.progress = 0
+                job.error_message = job.error_message or f"rq job {rq_job.get_status(refresh=False).value}"
+                job.finished_at = datetime.utcnow()
+                job.updated_at = datetime.utcnow()
+                db.commit()
+                failed += 1
+
+        if requeued or failed:
+            log.info("orphan sweep requeued=%s failed=%s", requeued, failed)
+        return {"requeued": requeued, "failed": failed}
+    finally:
+        db.close()
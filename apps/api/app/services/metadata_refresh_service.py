@@ -0,0 +1,173 @@
+import os
+import time
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, or_, select, update
+
+from apps.api.app.db.session import SessionLocal
+from apps.api.app.db.models.video import Video
+from apps.api.app.integrations.ytdlp_client import VideoUnavailable, extract_flat, extract_info
+from apps.api.app.services import video_list_cache
+
+log = logging.getLogger("metadata_refresh")
+
+METADATA_REFRESH_BATCH = int(os.getenv("METADATA_REFRESH_BATCH", "50"))
+METADATA_MAX_AGE_HOURS = int(os.getenv("METADATA_MAX_AGE_HOURS", "24"))
+# 過期程度分組：超過 METADATA_MAX_AGE_HOURS 的幾倍（由大到小），組內再依 view_count 排
+METADATA_STALE_BUCKETS = tuple(
+    sorted((int(x) for x in os.getenv("METADATA_STALE_BUCKETS", "7,3").split(",") if x.strip()), reverse=True)
+)
+# 暫時性失敗（網路、429、YouTube 掛掉）多久後再試；不當成已更新，但也不讓同一批每輪都卡在最前面
+METADATA_RETRY_MINUTES = int(os.getenv("METADATA_RETRY_MINUTES", "60"))
+# 每次打 YouTube 之間至少間隔幾秒（rate limit）
+METADATA_REQUEST_INTERVAL = float(os.getenv("METADATA_REQUEST_INTERVAL", "2"))
+# 同一頻道在這批裡至少有幾支才值得用 flat 抓整個頻道
+METADATA_FLAT_MIN_VIDEOS = int(os.getenv("METADATA_FLAT_MIN_VIDEOS", "2"))
+METADATA_FLAT_MAX_ENTRIES = int(os.getenv("METADATA_FLAT_MAX_ENTRIES", "500"))
+
+# channel_url 底下要 flat 的 tab
+CHANNEL_TABS = ("videos", "shorts")
+
+
+def _pick_stale(db, now: datetime) -> list[Video]:
+    """先依過期程度分組（從沒更新過 → 過期很久 → 剛過期），同一組內 view_count 高的優先。
+
+    只照 metadata_refreshed_at 排的話時間戳幾乎不會相同，view_count 永遠用不上；
+    分組後，熱門影片在同一個過期程度裡會先被更新。
+    """
+    cutoff = now - timedelta(hours=METADATA_MAX_AGE_HOURS)
+    bucket = case(
+        (Video.metadata_refreshed_at.is_(None), 0),
+        *(
+            (Video.metadata_refreshed_at < now - timedelta(hours=METADATA_MAX_AGE_HOURS * n), i)
+            for i, n in enumerate(METADATA_STALE_BUCKETS, start=1)
+        ),
+        else_=len(METADATA_STALE_BUCKETS) + 1,
+    )
+    stmt = (
+        select(Video)
+        .where(or_(Video.metadata_refreshed_at.is_(None), Video.metadata_refreshed_at < cutoff))
+        .order_by(
+            bucket,
+            Video.view_count.desc().nulls_last(),
+            Video.metadata_refreshed_at.asc(),
+        )
+        .limit(METADATA_REFRESH_BATCH)
+    )
+    return db.execute(stmt).scalars().all()
+
+
+def _fields(info: dict) -> dict:
+    # 只寫回有值的欄位，flat entry 常常缺 duration 之類的
+    out = {}
+    if info.get("title"):
+        out["title"] = info["title"]
+    if info.get("view_count") is not None:
+        out["view_count"] = info["view_count"]
+    if info.get("duration") is not None:
+        out["duration"] = int(info["duration"])
+        out["is_short"] = 1 if info["duration"] <= 60 else 0
+    if info.get("channel_url"):
+        out["channel_url"] = info["channel_url"]
+    return out
+
+
+class _Throttle:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last = 0.0
+
+    def wait(self):
+        delay = self.last + self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.last = time.monotonic()
+
+
+def refresh_stale_metadata() -> dict:
+    """挑一批最舊的影片更新 title / duration / view_count，bulk update 寫回。
+
+    同頻道的影片先用 channel tab 的 flat playlist 一次拿回多支的 view_count，
+    沒涵蓋到的才逐支 extract_info。flat 抓到、但不在這批裡的已知影片也順便更新。
+    """
+    db = SessionLocal()
+    throttle = _Throttle(METADATA_REQUEST_INTERVAL)
+    now = datetime.utcnow()
+    try:
+        batch = _pick_stale(db, now)
+        if not batch:
+            return {"refreshed": 0, "unavailable": 0, "failed": 0, "flat_requests": 0, "full_requests": 0}
+
+        fetched: dict[str, dict] = {}
+        flat_requests = full_requests = 0
+
+        by_channel: dict[str, list[Video]] = defaultdict(list)
+        for v in batch:
+            if v.channel_url:
+                by_channel[v.channel_url].append(v)
+
+        for channel_url, videos in by_channel.items():
+            if len(videos) < METADATA_FLAT_MIN_VIDEOS:
+                continue
+            for tab in CHANNEL_TABS:
+                throttle.wait()
+                flat_requests += 1
+                try:
+                    entries = extract_flat(f"{channel_url.rstrip('/')}/{tab}", max_entries=METADATA_FLAT_MAX_ENTRIES)
+                except Exception:
+                    log.warning("flat refresh failed channel=%s tab=%s", channel_url, tab, exc_info=True)
+                    continue
+                for e in entries:
+                    fields = _fields(e)
+                    if fields:
+                        fetched.setdefault(e["id"], {}).update(fields)
+
+        unavailable: set[str] = set()
+        for v in batch:
+            if v.video_id in fetched and "view_count" in fetched[v.video_id]:
+                continue
+            throttle.wait()
+            full_requests += 1
+            try:
+                info = extract_info(v.webpage_url)
+            except VideoUnavailable:
+                log.info("metadata refresh video unavailable video=%s", v.video_id)
+                unavailable.add(v.video_id)
+                continue
+            except Exception:
+                log.warning("metadata refresh failed video=%s", v.video_id, exc_info=True)
+                continue
+            fetched.setdefault(v.video_id, {}).update(_fields(info))
+
+        # flat 結果裡可能有很多不在 DB 的影片，只更新已知的
+        known = set(
+            db.execute(select(Video.video_id).where(Video.video_id.in_(list(fetched)))).scalars()
+        ) if fetched else set()
+        rows = [{"video_id": vid, **fields, "metadata_refreshed_at": now} for vid, fields in fetched.items() if vid in known]
+        # 確定下架 / 私人的也蓋上時間戳，避免每輪都卡在最前面
+        rows += [{"video_id": vid, "metadata_refreshed_at": now} for vid in unavailable]
+        # 其他失敗不算更新過：時間戳往回推，METADATA_RETRY_MINUTES 後再變成 stale 重試
+        retry_at = now - timedelta(hours=METADATA_MAX_AGE_HOURS) + timedelta(minutes=METADATA_RETRY_MINUTES)
+        failed = [v.video_id for v in batch if v.video_id not in known and v.video_id not in unavailable]
+        rows += [{"video_id": vid, "metadata_refreshed_at": retry_at} for vid in failed]
+
+        db.execute(update(Video), rows)
+        db.commit()
+        video_list_cache.invalidate()
+
+        refreshed = len(rows) - len(unavailable) - len(failed)
+        log.info(
+            "metadata refresh batch=%s updated=%s unavailable=%s failed=%s flat_requests=%s full_requests=%s",
+            len(batch), refreshed, len(unavailable), len(failed), flat_requests, full_requests,
+        )
+        return {
+            "refreshed": refreshed,
+            "unavailable": len(unavailable),
+            "failed": len(failed),
+            "flat_requests": flat_requests,
+            "full_requests": full_requests,
+        }
+    finally:
+        db.close()
@@ -0,0 +1,125 @@
+import os
+import hashlib
+import logging
+from datetime import datetime
+
+from sqlalchemy import delete, exists, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from apps.api.app.db.session import SessionLocal
+from apps.api.app.db.models.video import Video
+from apps.api.app.db.models.download_job import ACTIVE_STATUSES, DownloadJob
+from apps.api.app.db.models.download_error import DownloadError
+from apps.api.app.db.models.download_job_archive import DownloadJobArchive
+
+log = logging.getLogger("retention")
+
+# 每個 video 在 download_jobs 保留最新幾筆（queued/running 不論新舊都保留）
+RETENTION_KEEP_PER_VIDEO = max(1, int(os.getenv("RETENTION_KEEP_PER_VIDEO", "5")))
+# 每個 transaction 只搬這麼多筆，避免長時間鎖表
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "1000"))
+RETENTION_MAX_BATCHES = int(os.getenv("RETENTION_MAX_BATCHES", "50"))
+
+
+def _error_id(message: str) -> str:
+    return hashlib.sha1(message.encode("utf-8", "replace")).hexdigest()
+
+
+def _insert_errors(db, rows: list[dict]) -> None:
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(DownloadError).on_conflict_do_nothing(index_elements=[DownloadError.error_id])
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(DownloadError).on_conflict_do_nothing(index_elements=[DownloadError.error_id])
+    else:
+        known = set(db.execute(select(DownloadError.error_id).where(DownloadError.error_id.in_([r["error_id"] for r in rows]))).scalars())
+        rows = [r for r in rows if r["error_id"] not in known]
+        if not rows:
+            return
+        stmt = insert(DownloadError)
+    db.execute(stmt, rows)
+
+
+def _candidates_stmt(limit: int):
+    ranked = (
+        select(
+            DownloadJob.job_id,
+            func.row_number()
+            .over(
+                partition_by=DownloadJob.video_id,
+                order_by=(DownloadJob.created_at.desc(), DownloadJob.job_id.desc()),
+            )
+            .label("rn"),
+        )
+        .where(DownloadJob.status.not_in(ACTIVE_STATUSES))
+        .subquery()
+    )
+    # videos.last_download_job_id 指到的 job 不搬，避免 video 指到不存在的 job
+    referenced = exists().where(Video.last_download_job_id == ranked.c.job_id)
+    return (
+        select(ranked.c.job_id)
+        .where(ranked.c.rn > RETENTION_KEEP_PER_VIDEO)
+        .where(~referenced)
+        .limit(limit)
+    )
+
+
+def compact_download_jobs() -> dict:
+    """把每個 video 超過保留數量的舊 job 分批搬到 download_jobs_archive。
+
+    錯誤訊息依內容 hash 去重存到 download_errors。候選名單（window function 掃全表）
+    每次執行只算一次，之後每 RETENTION_BATCH 筆一批獨立 commit；
+    每次最多 RETENTION_MAX_BATCHES 批，剩下的下次再做。
+    """
+    db = SessionLocal()
+    archived = batches = 0
+    try:
+        candidates = db.execute(_candidates_stmt(RETENTION_BATCH * RETENTION_MAX_BATCHES)).scalars().all()
+        # 之後新建的 job 只會把這些舊 job 排得更後面，名單在整次執行中都仍然成立
+        for i in range(0, len(candidates), RETENTION_BATCH):
+            ids = candidates[i : i + RETENTION_BATCH]
+
+            jobs = db.execute(select(DownloadJob).where(DownloadJob.job_id.in_(ids))).scalars().all()
+            now = datetime.utcnow()
+
+            errors = {}
+            rows = []
+            for j in jobs:
+                error_id = None
+                if j.error_message:
+                    error_id = _error_id(j.error_message)
+                    errors[error_id] = {"error_id": error_id, "message": j.error_message, "created_at": now}
+                rows.append(
+                    {
+                        "job_id": j.job_id,
+                        "video_id": j.video_id,
+                        "status": j.status,
+                        "quality_profile": j.quality_profile,
+                        "format_id": j.format_id,
+                        "filesize_approx": j.filesize_approx,
+                        "node_id": j.node_id,
+                        "output_path": j.output_path,
+                        "error_id": error_id,
+                        "started_at": j.started_at,
+                        "finished_at": j.finished_at,
+                        "created_at": j.created_at,
+                        "archived_at": now,
+                    }
+                )
+
+            _insert_errors(db, list(errors.values()))
+            db.execute(insert(DownloadJobArchive), rows)
+            db.execute(delete(DownloadJob).where(DownloadJob.job_id.in_(ids)))
+            db.commit()
+            db.expunge_all()
+
+            archived += len(rows)
+            batches += 1
+
+        if archived:
+            log.info("retention archived=%s batches=%s keep_per_video=%s", archived, batches, RETENTION_KEEP_PER_VIDEO)
+        return {"archived": archived, "batches": batches}
+    finally:
+        db.close()
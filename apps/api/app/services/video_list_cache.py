@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+import logging
+import time
+
+from redis.exceptions import RedisError
+
+from apps.api.app.workers.queue import redis_conn
+
+log = logging.getLogger("video_list_cache")
+
+VIDEO_LIST_CACHE_TTL = int(os.getenv("VIDEO_LIST_CACHE_TTL", "300"))
+VIDEO_LIST_CACHE_MAX_ENTRIES = int(os.getenv("VIDEO_LIST_CACHE_MAX_ENTRIES", "500"))
+
+_PREFIX = "video_list_cache"
+GEN_KEY = f"{_PREFIX}:gen"
+INDEX_KEY = f"{_PREFIX}:index"      # zset: entry key -> 寫入時間（用來限制總量）
+HITS_KEY = f"{_PREFIX}:hits"
+MISSES_KEY = f"{_PREFIX}:misses"
+
+
+def _generation() -> int:
+    return int(redis_conn.get(GEN_KEY) or 0)
+
+
+def cache_key(filters: dict) -> str:
+    # 正規化：None 不算、key 排序，讓同一組條件永遠得到同一個 key
+    normalized = {k: v for k, v in sorted(filters.items()) if v is not None and v != ""}
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f"{_PREFIX}:{_generation()}:{digest}"
+
+
+def get_cached(filters: dict) -> tuple[str | None, object]:
+    """回傳 (key, 快取的 list_videos 結果)；沒命中時結果是 None，Redis 掛掉時 key 也是 None（改走 DB）。
+
+    沒命中時要把同一個 key 傳給 set_cached：generation 只在查詢前讀一次，
+    查 DB 期間若被 invalidate，舊結果會寫到已經失效的 generation 底下，不會被讀到。
+    """
+    try:
+        key = cache_key(filters)
+        raw = redis_conn.get(key)
+        redis_conn.incr(HITS_KEY if raw is not None else MISSES_KEY)
+    except RedisError:
+        log.warning("video list cache unavailable, falling back to db", exc_info=True)
+        return None, None
+    return key, json.loads(raw) if raw is not None else None
+
+
+def set_cached(key: str | None, payload) -> None:
+    if key is None:
+        return
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.set(key, json.dumps(payload), ex=VIDEO_LIST_CACHE_TTL)
+        pipe.zadd(INDEX_KEY, {key: time.time()})
+        # 超過上限 → 丟掉最舊的（含已經失效的舊 generation）
+        pipe.zrange(INDEX_KEY, 0, -(VIDEO_LIST_CACHE_MAX_ENTRIES + 1))
+        pipe.zremrangebyrank(INDEX_KEY, 0, -(VIDEO_LIST_CACHE_MAX_ENTRIES + 1))
+        evicted = pipe.execute()[2]
+        if evicted:
+            redis_conn.delete(*evicted)
+    except RedisError:
+        log.warning("video list cache write failed", exc_info=True)
+
+
+def invalidate() -> None:
+    """資料有變動時呼叫：bump generation，舊 key 不用掃，等 TTL/上限自然淘汰。"""
+    try:
+        redis_conn.incr(GEN_KEY)
+    except RedisError:
+        log.warning("video list cache invalidate failed", exc_info=True)
+
+
+def stats() -> dict:
+    try:
+        hits, misses = redis_conn.mget(HITS_KEY, MISSES_KEY)
+        entries = redis_conn.zcard(INDEX_KEY)
+        generation = _generation()
+    except RedisError:
+        return {"available": False}
+    hits, misses = int(hits or 0), int(misses or 0)
+    total = hits + misses
+    return {
+        "available": True,
+        "generation": generation,
+        "entries": entries,
+        "max_entries": VIDEO_LIST_CACHE_MAX_ENTRIES,
+        "ttl": VIDEO_LIST_CACHE_TTL,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
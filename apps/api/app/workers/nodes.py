@@ -0,0 +1,134 @@
+import os
+import time
+import shutil
+import socket
+import logging
+
+from redis.exceptions import RedisError
+from rq.registry import StartedJobRegistry
+
+from apps.api.app.workers.queue import redis_conn
+
+log = logging.getLogger("nodes")
+
+# 每台下載機器（node）有自己的 VIDEO_OUTDIR；檔案在哪台，post-processing 與檔案下載就得在哪台
+NODE_ID = os.getenv("NODE_ID") or socket.gethostname()
+# 這台 node 上 API 的對外網址，其他 node 收到檔案請求時 redirect 過來
+NODE_API_URL = os.getenv("NODE_API_URL")
+
+NODE_TTL = int(os.getenv("NODE_TTL", "60"))
+NODE_HEARTBEAT_INTERVAL = int(os.getenv("NODE_HEARTBEAT_INTERVAL", "15"))
+# 剩餘空間低於這個值就不再分配新 job
+NODE_MIN_FREE_BYTES = int(os.getenv("NODE_MIN_FREE_BYTES", str(5 * 1024**3)))
+
+NODES_KEY = "nodes"
+
+
+def node_key(node_id: str) -> str:
+    return f"node:{node_id}"
+
+
+def download_queue_name(node_id: str) -> str:
+    return f"downloads:{node_id}"
+
+
+def postprocess_queue_name(node_id: str) -> str:
+    return f"postprocess:{node_id}"
+
+
+def is_local(node_id: str | None) -> bool:
+    # node_id 為 NULL 的舊 job 都在單機時代建立，視為本機
+    return node_id is None or node_id == NODE_ID
+
+
+def _load(node_id: str) -> int:
+    # 排隊中 + 執行中的 job 數
+    load = 0
+    for name in (download_queue_name(node_id), postprocess_queue_name(node_id)):
+        load += redis_conn.llen(f"rq:queue:{name}")
+        load += StartedJobRegistry(name, connection=redis_conn).count
+    return load
+
+
+def heartbeat(outdir: str) -> None:
+    os.makedirs(outdir, exist_ok=True)
+    usage = shutil.disk_usage(outdir)
+    info = {
+        "node_id": NODE_ID,
+        "free_bytes": usage.free,
+        "total_bytes": usage.total,
+        "load": _load(NODE_ID),
+        "api_url": NODE_API_URL or "",
+        "updated_at": int(time.time()),
+    }
+    pipe = redis_conn.pipeline()
+    pipe.hset(node_key(NODE_ID), mapping=info)
+    pipe.expire(node_key(NODE_ID), NODE_TTL)
+    pipe.sadd(NODES_KEY, NODE_ID)
+    pipe.execute()
+
+
+def heartbeat_forever(outdir: str) -> None:
+    while True:
+        try:
+            heartbeat(outdir)
+        except Exception:
+            log.warning("node heartbeat failed node=%s", NODE_ID, exc_info=True)
+        time.sleep(NODE_HEARTBEAT_INTERVAL)
+
+
+def live_nodes() -> dict[str, dict]:
+    """目前有 heartbeat 的 node；過期的順手從 set 移掉。"""
+    ids = sorted(x.decode() for x in redis_conn.smembers(NODES_KEY))
+    if not ids:
+        return {}
+    pipe = redis_conn.pipeline()
+    for node_id in ids:
+        pipe.hgetall(node_key(node_id))
+    nodes = {}
+    for node_id, raw in zip(ids, pipe.execute()):
+        if not raw:
+            redis_conn.srem(NODES_KEY, node_id)
+            continue
+        info = {k.decode(): v.decode() for k, v in raw.items()}
+        nodes[node_id] = {
+            "node_id": node_id,
+            "free_bytes": int(info.get("free_bytes", 0)),
+            "total_bytes": int(info.get("total_bytes", 0)),
+            "load": int(info.get("load", 0)),
+            "api_url": info.get("api_url") or None,
+            "updated_at": int(info.get("updated_at", 0)),
+        }
+    return nodes
+
+
+def live_nodes_or_empty() -> dict[str, dict]:
+    # Redis 掛掉時當作沒有任何 node 活著
+    try:
+        return live_nodes()
+    except RedisError:
+        log.warning("node registry unavailable", exc_info=True)
+        return {}
+
+
+def assign_nodes(count: int) -> list[str | None]:
+    """幫 count 個新 job 挑 node：剩餘空間越多、load 越低越優先。
+
+    每分配一個就把該 node 的 load +1，批次建立時才不會全部擠到同一台。
+    沒有任何可用 node（單機部署、Redis 掛掉）→ None，走共用的 downloads queue。
+    """
+    nodes = [n for n in live_nodes_or_empty().values() if n["free_bytes"] >= NODE_MIN_FREE_BYTES]
+    if not nodes:
+        return [None] * count
+
+    load = {n["node_id"]: n["load"] for n in nodes}
+    out = []
+    for _ in range(count):
+        best = max(nodes, key=lambda n: n["free_bytes"] / (1 + load[n["node_id"]]))
+        load[best["node_id"]] += 1
+        out.append(best["node_id"])
+    return out
+
+
+def pick_node() -> str | None:
+    return assign_nodes(1)[0]
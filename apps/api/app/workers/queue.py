@@ -5,4 +5,13 @@ from rq import Queue
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 redis_conn = Redis.from_url(REDIS_URL)
-queue = Queue("downloads", connection=redis_conn, default_timeout=60 * 60)
\ No newline at end of file
+queue = Queue("downloads", connection=redis_conn, default_timeout=60 * 60)
+
+_queues: dict[str, Queue] = {}
+
+
+def get_queue(name: str) -> Queue:
+    # per-node queue（downloads:<node_id> / postprocess:<node_id>）
+    if name not in _queues:
+        _queues[name] = Queue(name, connection=redis_conn, default_timeout=60 * 60)
+    return _queues[name]
@@ -6,15 +6,55 @@ from sqlalchemy.orm import Session
 from apps.api.app.db.session import SessionLocal
 from apps.api.app.db.models.video import Video
 from apps.api.app.db.models.download_job import DownloadJob
-from apps.api.app.integrations.ytdlp_client import download_video
+from apps.api.app.integrations import ffmpeg_client
+from apps.api.app.integrations.ytdlp_client import DEFAULT_QUALITY_PROFILE, download_streams
+from apps.api.app.services import video_list_cache
+from apps.api.app.services.download_service import enqueue_postprocess
+from apps.api.app.workers.nodes import NODE_ID
 
 log = logging.getLogger("worker")
 
 VIDEO_OUTDIR = os.getenv("VIDEO_OUTDIR", "/app/storage/videos")
-MAX_HEIGHT = int(os.getenv("MAX_HEIGHT", "1080"))
+POSTPROCESS_THUMBNAILS = os.getenv("POSTPROCESS_THUMBNAILS", "0") == "1"
+# yt-dlp / ffmpeg 的錯誤訊息可能很長，DB 只留前面這段
+ERROR_MESSAGE_MAX_CHARS = int(os.getenv("ERROR_MESSAGE_MAX_CHARS", "2000"))
+
+# progress：download stage 5~70，postprocess stage 70~100
+DOWNLOAD_DONE_PROGRESS = 70
+
+
+def _mark_success(db: Session, job: DownloadJob, v: Video, out: str) -> None:
+    job.status = "success"
+    job.progress = 100
+    job.output_path = out
+    job.error_message = None
+    job.finished_at = datetime.utcnow()
+    job.updated_at = datetime.utcnow()
+
+    # Mark video as downloaded (requires columns on Video model)
+    if hasattr(v, "last_download_job_id"):
+        v.last_download_job_id = job.job_id
+    if hasattr(v, "downloaded_at"):
+        v.downloaded_at = datetime.utcnow()
+
+    db.commit()
+    video_list_cache.invalidate()
+
+
+def _mark_failed(db: Session, job_id: str, e: Exception) -> None:
+    db.rollback()
+    job = db.get(DownloadJob, job_id)
+    if job:
+        job.status = "failed"
+        job.progress = 0
+        job.error_message = str(e)[:ERROR_MESSAGE_MAX_CHARS]
+        job.finished_at = datetime.utcnow()
+        job.updated_at = datetime.utcnow()
+        db.commit()
 
 
 def download_task(job_id: str, video_id: str):
+    """Stage 1（downloads queue）：只做網路下載，merge / remux 交給 postprocess_task。"""
     db: Session = SessionLocal()
     try:
         job = db.get(DownloadJob, job_id)
@@ -27,7 +67,9 @@ def download_task(job_id: str, video_id: str):
 
         log.info("download start job=%s video=%s", job_id, video_id)
 
-        # 開始
+        # 開始（實際跑在哪台，檔案就存在哪台）
+        job.node_id = NODE_ID
+        job.stage = "download"
         job.status = "running"
         job.progress = 5
         job.started_at = datetime.utcnow()
@@ -36,56 +78,76 @@ def download_task(job_id: str, video_id: str):
 
         # 若已存在檔案（多保險一次）
         if job.output_path and os.path.exists(job.output_path):
-            job.status = "success"
-            job.progress = 100
-            job.finished_at = datetime.utcnow()
-            job.updated_at = datetime.utcnow()
-
-            # Mark video as downloaded (requires columns on Video model)
-            if hasattr(v, "last_download_job_id"):
-                v.last_download_job_id = job.job_id
-            if hasattr(v, "downloaded_at"):
-                v.downloaded_at = datetime.utcnow()
-
-            db.commit()
+            _mark_success(db, job, v, job.output_path)
             log.info("download already-present job=%s out=%s", job_id, job.output_path)
             return {"output_path": job.output_path}
 
-        out = download_video(
+        result = download_streams(
             url=v.webpage_url,
             base_outdir=VIDEO_OUTDIR,
             video_id=video_id,
             uploader=v.uploader,
-            max_height=MAX_HEIGHT,
+            profile_name=job.quality_profile or DEFAULT_QUALITY_PROFILE,
         )
 
-        job.status = "success"
-        job.progress = 100
-        job.output_path = out
-        job.error_message = None
-        job.finished_at = datetime.utcnow()
+        job.format_id = result["format_id"]
+        job.vcodec = result["vcodec"]
+        job.acodec = result["acodec"]
+        job.filesize_approx = result["filesize_approx"]
+
+        # 交給 postprocess stage
+        job.stage = "postprocess"
+        job.status = "queued"
+        job.progress = DOWNLOAD_DONE_PROGRESS
         job.updated_at = datetime.utcnow()
+        db.commit()
+
+        enqueue_postprocess(job_id, result["parts"], result["output_path"])
+        log.info("download fetched job=%s parts=%s", job_id, result["parts"])
+        return {"parts": result["parts"]}
 
-        # Mark video as downloaded (requires columns on Video model)
-        if hasattr(v, "last_download_job_id"):
-            v.last_download_job_id = job.job_id
-        if hasattr(v, "downloaded_at"):
-            v.downloaded_at = datetime.utcnow()
+    except Exception as e:
+        _mark_failed(db, job_id, e)
+        log.exception("download failed job=%s video=%s", job_id, video_id)
+        raise
+    finally:
+        db.close()
 
+
+def postprocess_task(job_id: str, parts: list[str], output_path: str):
+    """Stage 2（postprocess queue）：ffmpeg merge / remux / faststart（+ 縮圖），純 CPU / 本機 I/O。"""
+    db: Session = SessionLocal()
+    try:
+        job = db.get(DownloadJob, job_id)
+        if not job:
+            raise RuntimeError(f"download job not found: {job_id}")
+
+        v = db.get(Video, job.video_id)
+        if not v:
+            raise RuntimeError(f"video not found: {job.video_id}")
+
+        log.info("postprocess start job=%s parts=%s", job_id, parts)
+
+        job.stage = "postprocess"
+        job.status = "running"
+        job.progress = DOWNLOAD_DONE_PROGRESS + 5
+        job.updated_at = datetime.utcnow()
         db.commit()
+
+        out = ffmpeg_client.remux(parts, output_path)
+        if POSTPROCESS_THUMBNAILS and job.vcodec:
+            try:
+                ffmpeg_client.thumbnail(out)
+            except Exception:
+                log.warning("thumbnail failed job=%s", job_id, exc_info=True)
+
+        _mark_success(db, job, v, out)
         log.info("download success job=%s out=%s", job_id, out)
         return {"output_path": out}
 
     except Exception as e:
-        job = db.get(DownloadJob, job_id)
-        if job:
-            job.status = "failed"
-            job.progress = 0
-            job.error_message = str(e)
-            job.finished_at = datetime.utcnow()
-            job.updated_at = datetime.utcnow()
-            db.commit()
-        log.exception("download failed job=%s video=%s", job_id, video_id)
+        _mark_failed(db, job_id, e)
+        log.exception("postprocess failed job=%s", job_id)
         raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,86 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from apps.api.app.db.base import Base
+from apps.api.app.db.models.video import Video
+from apps.api.app.db.models.download_job import DownloadJob
+from apps.api.app.repos import download_repo
+
+
+@pytest.fixture
+def db():
+    # in-memory sqlite 也會建出 uq_download_jobs_active_video 這個 partial unique index
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    session.add_all([Video(video_id="v1", webpage_url="u1"), Video(video_id="v2", webpage_url="u2")])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _row(video_id: str, status: str = "queued") -> dict:
+    return {"job_id": str(uuid4()), "video_id": video_id, "status": status, "progress": 0}
+
+
+def _active_count(db, video_id: str) -> int:
+    stmt = select(DownloadJob).where(DownloadJob.video_id == video_id).where(DownloadJob.status.in_(("queued", "running")))
+    return len(db.execute(stmt).scalars().all())
+
+
+def test_insert_jobs_skips_videos_with_active_job(db):
+    first = _row("v1")
+    assert download_repo.insert_jobs(db, [first]) == {first["job_id"]}
+    db.commit()
+
+    dup, other = _row("v1"), _row("v2")
+    assert download_repo.insert_jobs(db, [dup, other]) == {other["job_id"]}
+    db.commit()
+
+    assert _active_count(db, "v1") == 1
+    assert db.get(DownloadJob, dup["job_id"]) is None
+
+
+def test_insert_jobs_conflicts_within_one_batch(db):
+    a, b = _row("v1"), _row("v1")
+    assert download_repo.insert_jobs(db, [a, b]) == {a["job_id"]}
+    db.commit()
+    assert _active_count(db, "v1") == 1
+
+
+def test_insert_job_or_get_active_returns_existing(db):
+    job, created = download_repo.insert_job_or_get_active(db, _row("v1"))
+    assert created
+    assert job.status == "queued"
+
+    again, created = download_repo.insert_job_or_get_active(db, _row("v1"))
+    assert not created
+    assert again.job_id == job.job_id
+
+
+def test_running_job_also_blocks_new_insert(db):
+    running = _row("v1", status="running")
+    download_repo.insert_jobs(db, [running])
+    db.commit()
+
+    job, created = download_repo.insert_job_or_get_active(db, _row("v1"))
+    assert not created
+    assert job.job_id == running["job_id"]
+
+
+def test_finished_job_does_not_block_new_insert(db):
+    job, _ = download_repo.insert_job_or_get_active(db, _row("v1"))
+    job.status = "success"
+    db.commit()
+
+    new, created = download_repo.insert_job_or_get_active(db, _row("v1"))
+    assert created
+    assert new.job_id != job.job_id
+    assert _active_count(db, "v1") == 1
@@ -0,0 +1,40 @@
+import os
+import time
+import logging
+
+from apps.api.app.services.download_service import sweep_orphan_jobs
+from apps.api.app.services.metadata_refresh_service import refresh_stale_metadata
+from apps.api.app.services.retention_service import compact_download_jobs
+
+log = logging.getLogger("maintenance")
+
+TICK_SECONDS = int(os.getenv("MAINTENANCE_TICK", "15"))
+
+# (task, 間隔秒數)
+TASKS = [
+    (sweep_orphan_jobs, int(os.getenv("ORPHAN_SWEEP_INTERVAL", "60"))),
+    (refresh_stale_metadata, int(os.getenv("METADATA_REFRESH_INTERVAL", "600"))),
+    (compact_download_jobs, int(os.getenv("RETENTION_INTERVAL", "3600"))),
+]
+
+
+def run_forever():
+    last_run: dict[str, float] = {}
+    while True:
+        now = time.monotonic()
+        for task, interval in TASKS:
+            name = task.__name__
+            if now - last_run.get(name, float("-inf")) < interval:
+                continue
+            last_run[name] = now
+            try:
+                result = task()
+                log.debug("maintenance %s -> %s", name, result)
+            except Exception:
+                log.exception("maintenance task failed: %s", name)
+        time.sleep(TICK_SECONDS)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_forever()
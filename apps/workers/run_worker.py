@@ -1,6 +1,105 @@
-from rq import Worker
+import os
+import sys
+import time
+import logging
+import threading
+
+from rq import SimpleWorker, Worker
+from sqlalchemy import text
+
+from apps.api.app.workers import nodes
 from apps.api.app.workers.queue import redis_conn
 
+log = logging.getLogger("worker")
+
+# 預設兩個 stage 都拿，單一 worker 就能把 job 跑完（postprocess 在前：先收尾已經抓完的，
+# 不會被一大批下載卡在 70%）；要分開 scale 時（compose）各自設 WORKER_QUEUES=downloads / postprocess
+WORKER_QUEUES = [q.strip() for q in os.getenv("WORKER_QUEUES", "postprocess,downloads").split(",") if q.strip()]
+# 先拿分配給這台 node 的 job（downloads:<node_id>），再拿共用 queue 的
+LISTEN_QUEUES = [name for q in WORKER_QUEUES for name in (f"{q}:{nodes.NODE_ID}", q)]
+
+# fork：RQ 預設，每個 job fork 一個 work-horse
+# persistent：同一個 process 連續跑 job，yt-dlp / HTTP 連線 / DB pool 都重用（短片很多時差很多）
+WORKER_MODE = os.getenv("WORKER_MODE", "fork")
+# persistent 模式跑滿幾個 job 就 re-exec 自己，限制記憶體成長
+WORKER_MAX_JOBS = int(os.getenv("WORKER_MAX_JOBS", "200"))
+
+if WORKER_MODE == "persistent":
+    # 要在 import ytdlp_client 之前設定
+    os.environ.setdefault("YTDLP_REUSE", "1")
+
+
+def warm_up():
+    from apps.api.app.db.session import engine
+    from apps.api.app.integrations import ytdlp_client
+    from apps.api.app.workers import tasks  # noqa: F401  先 import，job 不用再載入
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    ytdlp_client.warm_up()
+
+
+class CountingWorker(SimpleWorker):
+    """SimpleWorker 自己數跑過的 job。
+
+    RQ 只用 hincrby 更新 Redis 裡的 successful_job_count / failed_job_count，
+    本地物件上的欄位一直是 0，不能拿來判斷要不要 recycle。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.busy_seconds = 0.0
+
+    def perform_job(self, job, queue) -> bool:
+        started = time.monotonic()
+        try:
+            ok = super().perform_job(job, queue)
+        finally:
+            self.jobs_done += 1
+            self.busy_seconds += time.monotonic() - started
+        if not ok:
+            self.jobs_failed += 1
+        return ok
+
+
+def run_persistent():
+    warm_up()
+    started = time.monotonic()
+    w = CountingWorker(LISTEN_QUEUES, connection=redis_conn)
+    w.work(max_jobs=WORKER_MAX_JOBS)
+
+    jobs = w.jobs_done
+    elapsed = time.monotonic() - started
+    # 收到 SIGTERM / SIGINT（warm shutdown）時 RQ 會記下時間；這種情況就真的結束，不 re-exec
+    stop_requested = w._shutdown_requested_date is not None
+    log.info(
+        "persistent worker exiting jobs=%s failed=%s busy=%.1fs elapsed=%.1fs jobs/min=%.1f stop_requested=%s",
+        jobs, w.jobs_failed, w.busy_seconds, elapsed, jobs / elapsed * 60 if elapsed else 0, stop_requested,
+    )
+    if jobs >= WORKER_MAX_JOBS and not stop_requested:
+        # 換一個乾淨的 process 繼續
+        from apps.api.app.db.session import engine
+        from apps.api.app.integrations import ytdlp_client
+
+        ytdlp_client.close_cached()
+        engine.dispose()
+        os.execv(sys.executable, [sys.executable, "-m", "apps.workers.run_worker"])
+
+
+def start_heartbeat():
+    # 回報這台 node 的剩餘空間 / load，API 依此分配新 job
+    from apps.api.app.workers.tasks import VIDEO_OUTDIR
+
+    threading.Thread(target=nodes.heartbeat_forever, args=(VIDEO_OUTDIR,), daemon=True).start()
+
+
 if __name__ == "__main__":
-    w = Worker(["downloads"], connection=redis_conn)
-    w.work()
+    logging.basicConfig(level=logging.INFO)
+    start_heartbeat()
+    if WORKER_MODE == "persistent":
+        run_persistent()
+    else:
+        w = Worker(LISTEN_QUEUES, connection=redis_conn)
+        w.work()